@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+行情数据获取缓存
+同一进程内多个测试共享一次网络请求的结果，调用方不得修改返回的数据
+"""
+
+import functools
+import threading
+
+# 各测试用到的全部代码，首次请求时合并为一次批量调用
+SINA_SYMBOLS = {'002594'}
+YF_SYMBOLS = {'AAPL'}
+
+_QUOTE_CACHE = {}
+_QUOTE_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def cached_spot_em():
+    """
+    获取A股实时行情列表（ak.stock_zh_a_spot_em），进程内只请求一次
+    """
+    import akshare as ak
+    return ak.stock_zh_a_spot_em()
+
+
+def cached_sina_real(codes):
+    """
+    通过easyquotation新浪接口获取实时行情，codes为股票代码序列
+    缓存未命中时连同SINA_SYMBOLS中尚未获取的代码一次批量请求
+    返回 {代码: 行情}，接口未返回的代码不包含在结果中
+    """
+    with _QUOTE_LOCK:
+        if any(c not in _QUOTE_CACHE for c in codes):
+            import easyquotation
+            batch = sorted((SINA_SYMBOLS | set(codes)) - _QUOTE_CACHE.keys())
+            data = easyquotation.use('sina').real(batch)
+            for c in batch:
+                # 未返回的代码也记录下来，避免重复请求
+                _QUOTE_CACHE[c] = data.get(c)
+    return {c: _QUOTE_CACHE[c] for c in codes if _QUOTE_CACHE[c] is not None}
+
+
+@functools.lru_cache(maxsize=1)
+def _yf_tickers():
+    import yfinance as yf
+    return yf.Tickers(' '.join(sorted(YF_SYMBOLS)))
+
+
+def cached_yf_ticker(symbol):
+    """
+    获取yfinance Ticker对象，YF_SYMBOLS中的代码共用一个Tickers批量对象
+    """
+    if symbol in YF_SYMBOLS:
+        return _yf_tickers().tickers[symbol]
+    import yfinance as yf
+    return yf.Ticker(symbol)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+技术指标计算内核
+与TA-Lib默认算法保持一致（EMA以SMA作为初始值），可由numba编译
+"""
+
+import hashlib
+import inspect
+from collections import namedtuple
+
+import numpy as np
+
+from _njit import array_sigs, njit
+
+# indicators_fused 的各输出数组，均与输入等长，回看期内为NaN
+Indicators = namedtuple('Indicators', ['macd', 'signal', 'hist', 'rsi', 'upper', 'middle', 'lower'])
+
+
+# 显式签名使内核在导入时编译（或从缓存加载），避免首次调用时的编译停顿
+@njit(array_sigs('f8[:](f8[:], i8)'), cache=True)
+def sma(x, period):
+    """简单移动平均，前period-1个位置为NaN（与talib.SMA一致）"""
+    n = x.size
+    out = np.full(n, np.nan)
+    if period < 1 or n < period:
+        return out
+    total = 0.0
+    for i in range(period - 1):
+        total += x[i]
+    for i in range(period - 1, n):
+        total += x[i]
+        out[i] = total / period
+        total -= x[i - period + 1]
+    return out
+
+
+@njit(array_sigs('f8[:](f8[:], i8)'), cache=True)
+def rsi(x, period):
+    """Wilder平滑RSI，前period个位置为NaN（与talib.RSI一致）"""
+    n = x.size
+    out = np.full(n, np.nan)
+    if period < 2 or n <= period:
+        return out
+
+    gain = 0.0
+    loss = 0.0
+    for i in range(1, period + 1):
+        diff = x[i] - x[i - 1]
+        if diff < 0:
+            loss -= diff
+        else:
+            gain += diff
+    gain /= period
+    loss /= period
+
+    for i in range(period, n):
+        if i > period:
+            diff = x[i] - x[i - 1]
+            gain *= period - 1
+            loss *= period - 1
+            if diff < 0:
+                loss -= diff
+            else:
+                gain += diff
+            gain /= period
+            loss /= period
+        total = gain + loss
+        out[i] = 100.0 * gain / total if abs(total) > 1e-14 else 0.0
+    return out
+
+
+@njit(array_sigs('UniTuple(f8[:], 7)(f8[:], i8, i8, i8, i8, i8, f8)'), cache=True)
+def _fused(x, fast, slow, signal, rsi_n, boll_n, nbdev):
+    n = x.size
+    macd = np.full(n, np.nan)
+    sig = np.full(n, np.nan)
+    hist = np.full(n, np.nan)
+    rsi_out = np.full(n, np.nan)
+    upper = np.full(n, np.nan)
+    middle = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+
+    # MACD：快慢线都在t处以SMA为初始值，信号线在t+signal-1处以MACD均值为初始值
+    t = slow - 1
+    t_sig = t + signal - 1
+    kf = 2.0 / (fast + 1)
+    ks = 2.0 / (slow + 1)
+    kg = 2.0 / (signal + 1)
+    ema_f = 0.0
+    ema_s = 0.0
+    ema_g = 0.0
+
+    gain = 0.0
+    loss = 0.0
+    s = 0.0
+    s2 = 0.0
+
+    for i in range(n):
+        xi = x[i]
+
+        if i <= t:
+            ema_s += xi
+            if i >= t - fast + 1:
+                ema_f += xi
+            if i == t:
+                ema_s /= slow
+                ema_f /= fast
+        else:
+            ema_f = (xi - ema_f) * kf + ema_f
+            ema_s = (xi - ema_s) * ks + ema_s
+        if i >= t:
+            m = ema_f - ema_s
+            if i <= t_sig:
+                ema_g += m
+                if i == t_sig:
+                    ema_g /= signal
+            else:
+                ema_g = (m - ema_g) * kg + ema_g
+            if i >= t_sig:
+                macd[i] = m
+                sig[i] = ema_g
+                hist[i] = m - ema_g
+
+        # RSI：与rsi内核相同的Wilder平滑
+        if rsi_n >= 2 and i >= 1:
+            diff = xi - x[i - 1]
+            if i <= rsi_n:
+                if diff < 0:
+                    loss -= diff
+                else:
+                    gain += diff
+                if i == rsi_n:
+                    gain /= rsi_n
+                    loss /= rsi_n
+            else:
+                gain *= rsi_n - 1
+                loss *= rsi_n - 1
+                if diff < 0:
+                    loss -= diff
+                else:
+                    gain += diff
+                gain /= rsi_n
+                loss /= rsi_n
+            if i >= rsi_n:
+                total = gain + loss
+                rsi_out[i] = 100.0 * gain / total if abs(total) > 1e-14 else 0.0
+
+        # 布林带：滚动累计窗口内的和与平方和
+        if boll_n >= 2:
+            s += xi
+            s2 += xi * xi
+            if i >= boll_n:
+                old = x[i - boll_n]
+                s -= old
+                s2 -= old * old
+            if i >= boll_n - 1:
+                mean = s / boll_n
+                std = np.sqrt(max(s2 / boll_n - mean * mean, 0.0))
+                upper[i] = mean + nbdev * std
+                middle[i] = mean
+                lower[i] = mean - nbdev * std
+
+    return macd, sig, hist, rsi_out, upper, middle, lower
+
+
+def indicators_fused(x, fast=12, slow=26, signal=9, rsi_n=14, boll_n=20, nbdev=2.0):
+    """
+    一次遍历价格序列同时计算MACD、RSI和布林带，返回Indicators
+    x 须为C连续的float64数组，各指标的对齐方式与TA-Lib一致
+    """
+    return Indicators(*_fused(x, fast, slow, signal, rsi_n, boll_n, nbdev))
+
+
+def source_digest():
+    """rsi/sma内核源码的摘要（63位整数），用于识别由旧版源码编译的AOT扩展模块"""
+    src = inspect.getsource(rsi.py_func) + inspect.getsource(sma.py_func)
+    return int.from_bytes(hashlib.sha256(src.encode('utf-8')).digest()[:8], 'little') >> 1
+
+
+# 优先使用 python ta_kernels_aot.py 预编译的扩展模块，避免首次调用时的JIT编译；
+# 扩展模块由旧版源码编译（摘要不一致）时不使用
+try:
+    import ta_kernels
+    _aot_ok = ta_kernels.source_digest() == source_digest()
+except (ImportError, AttributeError):
+    _aot_ok = False
+_rsi_impl = ta_kernels.rsi_f64 if _aot_ok else rsi
+_sma_impl = ta_kernels.sma_f64 if _aot_ok else sma
+
+
+# AOT扩展模块不检查参数类型（整数数组会被当作float64读取），统一先转换为C连续的float64数组
+def rsi_f64(x, period):
+    """RSI（优先使用AOT扩展模块），x 转换为C连续的float64数组"""
+    return _rsi_impl(np.ascontiguousarray(x, dtype=np.float64), period)
+
+
+def sma_f64(x, period):
+    """SMA（优先使用AOT扩展模块），x 转换为C连续的float64数组"""
+    return _sma_impl(np.ascontiguousarray(x, dtype=np.float64), period)
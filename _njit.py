@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Numba JIT装饰器兼容层
+未安装numba时退化为普通Python函数，保证功能可用
+"""
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """numba.njit 的空实现，直接返回原函数"""
+        # 支持 @njit 和 @njit(...) 两种写法
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
+
+
+# 只读的一维float64数组（任意布局）
+_READONLY_F8 = "Array(f8, 1, 'A', readonly=True)"
+
+
+def array_sigs(sig):
+    """
+    把签名参数中的 f8[:] 展开为两个版本：全部为可写C连续数组、全部为只读数组
+    pandas写时复制下 Series.values 返回只读数组，只有 f8[:] 签名时会匹配失败；
+    可写的C连续数组精确匹配第一个版本，其余情况（只读、非连续或混合）都可转换为第二个版本
+    """
+    # 参数列表为签名末尾的最外层括号，返回类型中可能也含有括号
+    depth = 0
+    for i in range(len(sig) - 1, -1, -1):
+        if sig[i] == ')':
+            depth += 1
+        elif sig[i] == '(':
+            depth -= 1
+            if depth == 0:
+                break
+    ret, args = sig[:i], sig[i:]
+    return [ret + args.replace('f8[:]', 'f8[::1]'), ret + args.replace('f8[:]', _READONLY_F8)]
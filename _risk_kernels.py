@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+风险指标计算内核
+单次遍历计算均值、波动率、夏普比率和VaR，适用于小规模收益率数组
+各内核带显式签名，导入时即编译（或从磁盘缓存加载），首次调用没有编译停顿
+"""
+
+import math
+
+import numpy as np
+
+from _njit import array_sigs, njit
+
+
+@njit(array_sigs('UniTuple(f8, 3)(f8[:])'), cache=True)
+def risk_stats(r):
+    """
+    单次遍历计算均值、标准差(总体)和夏普比率
+    """
+    n = r.size
+    if n == 0:
+        return np.nan, np.nan, 0.0
+
+    s = 0.0
+    s2 = 0.0
+    for x in r:
+        s += x
+        s2 += x * x
+
+    mean = s / n
+    # 浮点误差可能导致方差略小于0
+    var = max(s2 / n - mean * mean, 0.0)
+    std = math.sqrt(var)
+    sharpe = mean / std if std > 0 else 0.0
+    return mean, std, sharpe
+
+
+@njit(array_sigs('f8(f8[:], f8)'), cache=True)
+def _partition_quantile(part, q):
+    """在已按所需下标划分的数组上做线性插值（与np.percentile默认方法一致）"""
+    pos = q / 100.0 * (part.size - 1)
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, part.size - 1)
+    return part[lo] + (part[hi] - part[lo]) * (pos - lo)
+
+
+@njit(array_sigs('UniTuple(f8, 2)(f8[:], f8, f8)'), cache=True)
+def percentile_pair(r, p1, p2):
+    """
+    一次划分同时计算两个分位数，如VaR95/VaR99对应的5%和1%分位
+    """
+    n = r.size
+    if n == 0:
+        return np.nan, np.nan
+
+    kth = np.empty(4, dtype=np.int64)
+    i = 0
+    for q in (p1, p2):
+        pos = q / 100.0 * (n - 1)
+        lo = int(math.floor(pos))
+        kth[i] = lo
+        kth[i + 1] = min(lo + 1, n - 1)
+        i += 2
+
+    part = np.partition(r, kth)
+    return _partition_quantile(part, p1), _partition_quantile(part, p2)
+
+
+@njit(array_sigs('f8[:](f8[:], i8)'), cache=True)
+def rolling_std_welford(x, w):
+    """
+    滚动标准差(样本, ddof=1)，窗口进出时增量更新均值和平方差
+    窗口内存在NaN或数据不足时输出NaN，与pandas rolling(w).std()一致
+    """
+    n = x.size
+    out = np.empty(n, dtype=np.float64)
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        v = x[i]
+        if not np.isnan(v):
+            count += 1
+            delta = v - mean
+            mean += delta / count
+            m2 += delta * (v - mean)
+
+        if i >= w:
+            old = x[i - w]
+            if not np.isnan(old):
+                count -= 1
+                if count == 0:
+                    mean = 0.0
+                    m2 = 0.0
+                else:
+                    delta = old - mean
+                    mean -= delta / count
+                    m2 -= delta * (old - mean)
+
+        if count < w or w < 2:
+            out[i] = np.nan
+        else:
+            out[i] = math.sqrt(max(m2, 0.0) / (count - 1))
+    return out
+
+
+@njit(array_sigs('UniTuple(f8, 2)(f8[:], f8, f8)'), cache=True)
+def _order_stat_var(r, q95, q99):
+    """按 max(0, int(q*n)-1) 取两个分位的顺序统计量，一次划分完成"""
+    n = r.size
+    k95 = max(0, int(q95 * n) - 1)
+    k99 = max(0, int(q99 * n) - 1)
+    kth = np.empty(2, dtype=np.int64)
+    kth[0] = k99
+    kth[1] = k95
+    part = np.partition(r, kth)
+    return part[k95], part[k99]
+
+
+@njit(array_sigs('UniTuple(f8, 6)(f8[:], f8)'), cache=True)
+def returns_stats(r, rf):
+    """
+    收益率统计汇总：一次遍历同时累计均值、方差和最大回撤，VaR由一次划分得到
+    返回 (均值, 标准差(总体), VaR95, VaR99, 夏普比率, 最大回撤)，rf为单期无风险利率
+    """
+    n = r.size
+    if n == 0:
+        return np.nan, np.nan, np.nan, np.nan, 0.0, 0.0
+
+    s = 0.0
+    s2 = 0.0
+    cum = 1.0
+    peak = -np.inf
+    mdd = 0.0
+    for x in r:
+        s += x
+        s2 += x * x
+        cum *= 1.0 + x
+        if cum > peak:
+            peak = cum
+        dd = (cum - peak) / peak
+        if dd < mdd:
+            mdd = dd
+
+    mean = s / n
+    var = max(s2 / n - mean * mean, 0.0)
+    std = math.sqrt(var)
+    sharpe = (mean - rf) / std if std > 0 else 0.0
+    var95, var99 = _order_stat_var(r, 0.05, 0.01)
+    return mean, std, var95, var99, sharpe, mdd
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+分析器使用的夏普比率内核
+与测试用的 _risk_kernels 分开，导入分析器时只编译这一个内核
+"""
+
+import math
+
+import numpy as np
+
+from _njit import array_sigs, njit
+
+
+@njit(array_sigs('f8(f8[:], f8, f8)'), cache=True)
+def trimmed_sharpe(r, rf, periods):
+    """
+    年化夏普比率：样本数大于10时均值取5%-95%截断均值，波动率为全样本总体标准差
+    Welford单次遍历得到方差，截断区间由一次划分得到，无需完整排序
+    rf为年化无风险利率，periods为每年期数；波动率为0时返回NaN
+    """
+    n = r.size
+    if n == 0:
+        return np.nan
+
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        delta = r[i] - mean
+        mean += delta / (i + 1)
+        m2 += delta * (r[i] - mean)
+
+    avg = mean
+    if n > 10:
+        lo = int(0.05 * n)
+        hi = int(0.95 * n)
+        if hi > lo:
+            kth = np.empty(2, dtype=np.int64)
+            kth[0] = lo
+            kth[1] = hi - 1
+            part = np.partition(r, kth)
+            total = 0.0
+            for i in range(lo, hi):
+                total += part[i]
+            avg = total / (hi - lo)
+
+    volatility = math.sqrt(m2 / n) * math.sqrt(periods)
+    if volatility == 0:
+        return np.nan
+    return (avg * periods - rf) / volatility
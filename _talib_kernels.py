@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+TA-Lib C函数直连内核
+通过ctypes加载TA-Lib动态库，在numba编译函数内一次性计算多个指标，
+省去talib Python包装层的参数检查和输出数组分配
+找不到动态库、未安装numba或禁用了JIT时回退到 _indicator_kernels 中的等价实现
+"""
+
+import ctypes
+import ctypes.util
+import glob
+import os
+
+import numpy as np
+
+from _indicator_kernels import rsi_f64, sma_f64
+from _njit import NUMBA_AVAILABLE, njit
+
+_TA_SUCCESS = 0
+
+
+def _find_talib_library():
+    """
+    查找TA-Lib动态库路径，依次尝试系统库和talib wheel自带的库
+    """
+    for name in ('ta-lib', 'ta_lib'):
+        path = ctypes.util.find_library(name)
+        if path:
+            return path
+
+    try:
+        import talib
+    except ImportError:
+        return None
+
+    site_dir = os.path.dirname(os.path.dirname(os.path.abspath(talib.__file__)))
+    candidates = glob.glob(os.path.join(site_dir, 'ta_lib.libs', 'libta*lib*.so*'))
+    return candidates[0] if candidates else None
+
+
+def _open_loaded_library(path):
+    """
+    若动态库已被当前进程加载（例如talib扩展模块链接的就是它），返回其句柄，否则返回None
+    """
+    noload = getattr(os, 'RTLD_NOLOAD', None)
+    if noload is None:
+        return None
+    try:
+        return ctypes.CDLL(path, mode=noload | os.RTLD_NOW)
+    except OSError:
+        return None
+
+
+def _load_talib_library():
+    path = _find_talib_library()
+    if path is None:
+        return None
+    try:
+        # talib导入时已对其链接的库调用过TA_Initialize，再次调用会重置库的全局状态
+        #（如talib设置的未稳定期），因此已加载的库直接复用
+        lib = _open_loaded_library(path)
+        if lib is None:
+            lib = ctypes.CDLL(path)
+            if lib.TA_Initialize() != _TA_SUCCESS:
+                return None
+    except (OSError, AttributeError):
+        return None
+
+    # TA_RetCode TA_XXX(int startIdx, int endIdx, const double inReal[],
+    #                   int optInTimePeriod, int *outBegIdx, int *outNBElement,
+    #                   double outReal[])
+    for func in (lib.TA_RSI, lib.TA_SMA):
+        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_int,
+                         ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
+        func.restype = ctypes.c_int
+    return lib
+
+
+# 直连内核依赖numba编译期的intrinsic，NUMBA_DISABLE_JIT=1时按纯Python执行会失败，此时不加载动态库
+_JIT_ENABLED = NUMBA_AVAILABLE and not __import__('numba').config.DISABLE_JIT
+_lib = _load_talib_library() if _JIT_ENABLED else None
+NATIVE_AVAILABLE = _lib is not None
+
+
+if NATIVE_AVAILABLE:
+    from numba.core import cgutils, types
+    from numba.extending import intrinsic
+
+    _ta_rsi = _lib.TA_RSI
+    _ta_sma = _lib.TA_SMA
+
+    @intrinsic
+    def _address_as_void_pointer(typingctx, src):
+        """把整数地址转换为void*，供ctypes函数在编译代码中直接调用"""
+        sig = types.voidptr(src)
+
+        def codegen(cgctx, builder, sig, args):
+            return builder.inttoptr(args[0], cgutils.voidptr_t)
+
+        return sig, codegen
+
+    # 引用了ctypes函数指针的编译结果无法写入磁盘缓存，因此不开启cache
+    @njit
+    def _call_period_func(func, prices, period, out):
+        """调用单输入单周期的TA函数，结果按talib约定对齐（前导位置填NaN）"""
+        n = prices.size
+        out[:] = np.nan
+        if n == 0:
+            return
+        beg = np.zeros(1, dtype=np.int32)
+        nb_elem = np.zeros(1, dtype=np.int32)
+        buf = np.empty(n, dtype=np.float64)
+        ret = func(0, n - 1,
+                   _address_as_void_pointer(prices.ctypes.data),
+                   period,
+                   _address_as_void_pointer(beg.ctypes.data),
+                   _address_as_void_pointer(nb_elem.ctypes.data),
+                   _address_as_void_pointer(buf.ctypes.data))
+        if ret != 0:
+            return
+        start = beg[0]
+        for i in range(nb_elem[0]):
+            out[start + i] = buf[i]
+
+    @njit
+    def _compute_indicators_native(prices, out_rsi, out_sma, rsi_period, sma_period):
+        _call_period_func(_ta_rsi, prices, rsi_period, out_rsi)
+        _call_period_func(_ta_sma, prices, sma_period, out_sma)
+
+
+def compute_indicators(prices, out_rsi, out_sma, rsi_period=14, sma_period=20):
+    """
+    在同一价格序列上计算RSI和SMA，结果写入预分配的输出数组
+    """
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    if NATIVE_AVAILABLE:
+        _compute_indicators_native(prices, out_rsi, out_sma, rsi_period, sma_period)
+    else:
+        out_rsi[:] = rsi_f64(prices, rsi_period)
+        out_sma[:] = sma_f64(prices, sma_period)
+    return out_rsi, out_sma
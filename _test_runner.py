@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试脚本公共运行器
+并发执行相互独立的测试函数，并按线程分别捕获各测试的输出
+"""
+
+import functools
+import importlib.util
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+@functools.lru_cache(maxsize=None)
+def module_available(name):
+    """
+    判断模块是否已安装（只查找模块规格，不执行模块代码）
+    结果在进程内缓存，多个测试脚本查询同一个库时只查找一次
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # 父包不存在或模块规格无效
+        return False
+
+
+class _ThreadLocalStdout:
+    """按线程分流的stdout，已登记缓冲区的线程写入自己的缓冲区"""
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def capture(self):
+        buf = io.StringIO()
+        self._local.buf = buf
+        return buf
+
+    def release(self):
+        self._local.buf = None
+
+    def _target(self):
+        return getattr(self._local, 'buf', None) or self._default
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._default, name)
+
+
+def summary_lines(results, title, width, overall, on_pass=(), on_fail=()):
+    """
+    生成测试结果汇总的各行：标题、逐项PASS/FAIL、总成绩、结论，末尾一行为JSON（便于其他工具解析）
+    results 为 {测试名称: 是否通过}；overall、on_pass、on_fail 中的文字可使用 {passed}、{total}、{failed}
+    返回 (行列表, 是否全部通过)
+    """
+    passed = sum(results.values())
+    total = len(results)
+    counts = {'passed': passed, 'total': total, 'failed': total - passed}
+    
+    lines = ["\n" + "=" * width, title, "=" * width]
+    lines.extend(f"{'✅ PASS' if result else '❌ FAIL'} {name}" for name, result in results.items())
+    lines.append("\n" + overall.format(**counts))
+    lines.extend(msg.format(**counts) for msg in (on_pass if passed == total else on_fail))
+    lines.append(json.dumps({"passed": passed, "total": total, "detail": results}, ensure_ascii=False))
+    return lines, passed == total
+
+
+def _worker_count(n_tests):
+    # 为主进程（如pytest）保留两个核心
+    return max(1, min(n_tests, (os.cpu_count() or 1) - 2))
+
+
+def run_tests_concurrently(tests, max_workers=None, on_error=False):
+    """
+    并发运行 [(名称, 测试函数), ...]
+    返回按原顺序排列的 [(名称, 结果, 输出文本), ...]
+    max_workers 默认按CPU核心数确定，on_error 为测试抛出异常时记录的结果
+    """
+    proxy = _ThreadLocalStdout(sys.stdout)
+    if max_workers is None:
+        max_workers = _worker_count(len(tests))
+
+    def run_one(test_func):
+        buf = proxy.capture()
+        try:
+            result = test_func()
+        except Exception as e:
+            print(f"✗ {test_func.__name__} 执行失败: {e}")
+            result = on_error
+        finally:
+            proxy.release()
+        return result, buf.getvalue()
+
+    original = sys.stdout
+    sys.stdout = proxy
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            futures = [(name, ex.submit(run_one, func)) for name, func in tests]
+            return [(name, *fut.result()) for name, fut in futures]
+    finally:
+        sys.stdout = original
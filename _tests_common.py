@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试脚本共享的输入数据和统一入口
+价格序列、随机数缓冲区在进程内只构建一次；run() 在同一进程中依次运行多个测试脚本，
+共享行情缓存、已导入模块和编译好的内核
+"""
+
+import functools
+import importlib
+import os
+import socket
+import sys
+import traceback
+
+import numpy as np
+
+from _test_runner import module_available
+
+# 测试用收盘价：基础序列在模块加载时构建一次，用np.tile扩展，避免逐元素转换Python列表
+BASE_PRICES = np.array([100, 102, 101, 103, 105, 104, 106, 108, 107, 109], dtype=np.float64)
+CLOSE_PRICES = np.tile(BASE_PRICES, 10)
+
+# 共享随机数缓冲区：固定种子一次生成，各测试按需切片使用（只读，不要原地修改）
+_RNG = np.random.default_rng(0)
+NOISE = _RNG.standard_normal(4096)
+UNIF = _RNG.random(4096)
+
+# 测试类别 -> (脚本模块名, 入口函数名)，入口函数返回是否整体通过
+SUITES = {
+    'robust': ('test_robust', 'main'),
+    'full': ('test_stock_analysis', 'main'),
+    'simple': ('test_stock_analysis_simple', 'run_test'),
+}
+
+
+def prep(a):
+    """转为C连续的float64数组，避免TA-Lib在每次调用时内部复制"""
+    return np.ascontiguousarray(a, dtype=np.float64)
+
+
+def lazy(name):
+    """按需导入可选依赖，未安装时返回None（不进入导入流程）"""
+    return importlib.import_module(name) if module_available(name) else None
+
+
+@functools.lru_cache(maxsize=1)
+def online(host='114.114.114.114', port=53, timeout=0.5):
+    """
+    用一次TCP连接探测网络是否可用，结果在进程内缓存
+    离线时联网测试据此直接跳过，不必逐个等待连接超时
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        s.connect((host, port))
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+
+def _load_suite(module_name):
+    # 直接运行的脚本已作为__main__加载，复用它，避免模块级代码再执行一遍
+    main = sys.modules.get('__main__')
+    main_file = getattr(main, '__file__', None)
+    if main_file and os.path.splitext(os.path.basename(main_file))[0] == module_name:
+        return main
+    return importlib.import_module(module_name)
+
+
+def run(categories):
+    """
+    按SUITES中的顺序运行categories包含的测试脚本
+    返回所有脚本是否都通过
+    """
+    unknown = set(categories) - SUITES.keys()
+    if unknown:
+        raise ValueError(f"未知的测试类别: {', '.join(sorted(unknown))}")
+
+    success = True
+    for category, (module_name, entry) in SUITES.items():
+        if category not in categories:
+            continue
+        try:
+            passed = getattr(_load_suite(module_name), entry)()
+        except Exception as e:
+            print(f"测试执行出错: {e}")
+            traceback.print_exc()
+            passed = False
+        success = bool(passed) and success
+    return success
+
+
+if __name__ == "__main__":
+    # 不带参数时运行全部测试脚本，例如: python _tests_common.py robust simple
+    selected = set(sys.argv[1:]) or set(SUITES)
+    sys.exit(0 if run(selected) else 1)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+行情数据清洗的标量内核
+可在其他numba内核中直接调用（编译时内联，没有Python调用开销），也可作为普通函数使用
+"""
+
+import numpy as np
+
+from _njit import array_sigs, njit
+
+# trade_check 的返回码
+TRADE_OK = 0
+TRADE_BAD_VOLUME = 1     # 成交量不大于0
+TRADE_BAD_AMOUNT = 2     # 成交额为负
+TRADE_MISMATCH = 3       # 成交额与价格、成交量不匹配
+
+
+@njit('i8(f8, f8, f8)', cache=True)
+def trade_check(volume, amount, price):
+    """
+    验证单条交易数据，规则与EnhancedStockAnalyzer.validate_trade_data一致
+    成交量单位为手（每手100股）；NaN参与比较时均为False，因此NaN不会被判为无效，
+    价格或成交量为NaN、不大于0时不校验成交额是否匹配
+    """
+    if volume <= 0:
+        return TRADE_BAD_VOLUME
+    if amount < 0:
+        return TRADE_BAD_AMOUNT
+    if price > 0 and volume > 0:
+        estimated = price * volume * 100
+        # 允许一定误差范围（50%）
+        if abs(amount - estimated) / estimated > 0.5:
+            return TRADE_MISMATCH
+    return TRADE_OK
+
+
+@njit(array_sigs('b1[:](f8[:], f8[:], f8[:])'), cache=True)
+def trade_check_batch(volume, amount, price):
+    """逐条调用trade_check，返回是否通过的布尔数组"""
+    n = volume.size
+    out = np.empty(n, dtype=np.bool_)
+    for i in range(n):
+        out[i] = trade_check(volume[i], amount[i], price[i]) == TRADE_OK
+    return out
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+pytest 公共设置
+"""
+
+import os
+
+# 测试时numba编译缓存统一放在项目目录下，各测试进程复用（需在导入numba前设置）
+os.environ.setdefault(
+    'NUMBA_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.numba_cache')
+)
@@ -8,10 +8,20 @@ import easyquotation
 import akshare as ak
 import pandas as pd
 import numpy as np
-import talib
 import warnings
+from _indicator_kernels import indicators_fused
+from _sharpe_kernels import trimmed_sharpe
+from _trade_kernels import TRADE_BAD_AMOUNT, TRADE_BAD_VOLUME, TRADE_MISMATCH, trade_check, trade_check_batch
+from validation_framework import is_valid_code_format
 warnings.filterwarnings('ignore')
 
+# 多数据源行情的结构化数组字段：成交量可能缺失，用float64保存以便以NaN表示
+_SOURCE_DTYPE = np.dtype([('price', 'f8'), ('volume', 'f8'), ('amount', 'f8'), ('ts', 'i8')])
+_CONSISTENCY_FIELDS = ('price', 'volume', 'amount')
+
+# 各数据源行情时间戳（int64纪元纳秒）允许的最大相差
+MAX_SKEW_NS = 60 * 10**9
+
 class EnhancedStockAnalyzer:
     """增强版股票分析器，包含数据验证和错误处理"""
     
@@ -21,6 +31,10 @@ class EnhancedStockAnalyzer:
     
     def validate_stock_code(self, name, code):
         """验证股票代码与名称的匹配性"""
+        # 格式不对的代码直接拒绝，不发起网络请求
+        if not is_valid_code_format(code):
+            return False, code, None
+        
         try:
             info = ak.stock_individual_info_em(symbol=code)
             if not info.empty:
@@ -36,8 +50,36 @@ class EnhancedStockAnalyzer:
             print(f"代码验证失败: {e}")
             return False, code, None
     
+    # 字符串数值中需要去除的千分位、百分号和单位字符
+    _STRIP_PATTERN = r'[,%亿万]'
+    # float()可解析为NaN的字符串（如"nan"、" -NaN "）
+    _NAN_PATTERN = r'\s*[+-]?nan\s*'
+    
+    @classmethod
+    def safe_float_conversion_array(cls, values, default=0.0):
+        """
+        批量安全浮点数转换，返回与输入形状相同的float64数组
+        None或无法解析的值取default；原本就是NaN的数值和"nan"字符串保持NaN，与safe_float_conversion一致
+        """
+        arr = np.asarray(values, dtype=object)
+        flat = pd.Series(arr.ravel())
+        
+        # 只有字符串会被清理，其他类型的值保持原样
+        try:
+            stripped = flat.str.replace(cls._STRIP_PATTERN, '', regex=True)
+            cleaned = stripped.where(stripped.notna(), flat)
+            nan_text = stripped.str.fullmatch(cls._NAN_PATTERN, case=False).fillna(False).to_numpy(dtype=bool)
+        except AttributeError:
+            # 输入中没有字符串时无法使用.str访问器
+            cleaned = flat
+            nan_text = False
+        nums = pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        keep_nan = (flat.isna().to_numpy() & ~np.equal(arr.ravel(), None)) | nan_text
+        return np.where(np.isnan(nums) & ~keep_nan, default, nums).reshape(arr.shape)
+    
     def safe_float_conversion(self, value, default=0.0):
-        """安全浮点数转换"""
+        """安全浮点数转换（单个值；多个值请用safe_float_conversion_array）"""
         try:
             if value is None:
                 return default
@@ -50,24 +92,90 @@ class EnhancedStockAnalyzer:
             return default
     
     def validate_trade_data(self, volume, amount, price):
-        """验证交易数据的合理性"""
-        if volume <= 0:
+        """验证交易数据的合理性（判定由 _trade_kernels.trade_check 完成，此处只生成提示信息）"""
+        if amount is None:
+            return False, "成交额不能为负数或None"
+        
+        status = trade_check(float(volume), float(amount), np.nan if price is None else float(price))
+        if status == TRADE_BAD_VOLUME:
             return False, "成交量必须大于0"
         
-        if amount is None or amount < 0:
+        if status == TRADE_BAD_AMOUNT:
             return False, "成交额不能为负数或None"
         
-        # 如果价格和成交量都有，验证成交额的合理性
-        if price and volume and price > 0 and volume > 0:
+        if status == TRADE_MISMATCH:
             estimated_amount = price * volume * 100  # 成交量单位是手，每手100股
-            # 允许一定误差范围（50%）
-            if abs(amount - estimated_amount) / estimated_amount > 0.5:
-                return False, f"成交额与价格、成交量不匹配 (估算: {estimated_amount:.0f}, 实际: {amount:.0f})"
+            return False, f"成交额与价格、成交量不匹配 (估算: {estimated_amount:.0f}, 实际: {amount:.0f})"
         
         return True, "数据合理"
     
-    def safe_macd_calculation(self, close_prices, min_periods=26):
-        """安全的MACD计算，包含数据验证"""
+    def validate_trade_data_array(self, volume, amount, price):
+        """
+        批量验证交易数据的合理性，返回布尔掩码（规则与validate_trade_data相同）
+        volume/amount/price 为等长序列，None 转为NaN，与validate_trade_data对NaN数值的处理相同（不判为无效）
+        """
+        return trade_check_batch(
+            np.ascontiguousarray(volume, dtype=np.float64),
+            np.ascontiguousarray(amount, dtype=np.float64),
+            np.ascontiguousarray(price, dtype=np.float64),
+        )
+    
+    @staticmethod
+    def _pack_sources(sources_data):
+        """
+        将 {数据源: {'price': ..., 'volume': ..., 'amount': ..., 'ts': ...}} 转为 (数据源名称数组, _SOURCE_DTYPE结构化数组)
+        ts 为int64纪元纳秒（如 pd.Timestamp.now().value），缺失的数值字段记为NaN，缺失的时间戳记为0
+        """
+        names = np.array(list(sources_data), dtype=object)
+        arr = np.zeros(len(names), dtype=_SOURCE_DTYPE)
+        for field in _CONSISTENCY_FIELDS:
+            arr[field] = [np.nan if (v := rec.get(field)) is None else v for rec in sources_data.values()]
+        arr['ts'] = [rec.get('ts', 0) for rec in sources_data.values()]
+        return names, arr
+    
+    def validate_data_consistency(self, sources_data, tolerance=0.05, max_skew_ns=MAX_SKEW_NS):
+        """
+        多数据源一致性检查
+        sources_data 为 {数据源: {'price': ..., 'volume': ..., 'amount': ..., 'ts': ...}}，
+        或 _pack_sources 返回的 (数据源名称数组, 结构化数组)
+        以各字段的中位数为共识值，返回偏离最小的数据源记录（含'source'键），
+        以及所有数据源的相对偏离是否都在 tolerance 以内、时间戳相差是否小于 max_skew_ns
+        """
+        names, arr = self._pack_sources(sources_data) if isinstance(sources_data, dict) else sources_data
+        if len(arr) == 0:
+            return None, False
+        
+        # 每行一个数据源、每列一个字段的相对偏离，某数据源的偏离取各字段中的最大值（忽略NaN）
+        values = np.column_stack([arr[field] for field in _CONSISTENCY_FIELDS])
+        med = np.nanmedian(values, axis=0)
+        max_dev = np.fmax.reduce(np.abs(values - med) / med, axis=1)
+        if np.isnan(max_dev).all():
+            return None, False
+        
+        best = int(np.nanargmin(max_dev))
+        selected = {field: float(values[best, j]) for j, field in enumerate(_CONSISTENCY_FIELDS)}
+        selected['source'] = names[best]
+        
+        # 时间戳为整数纳秒，新鲜度检查只需整数比较；未提供时间戳（为0）的数据源不参与
+        ts = arr['ts'][arr['ts'] != 0]
+        fresh = ts.size == 0 or int(ts.max() - ts.min()) < max_skew_ns
+        if arr['ts'][best] != 0:
+            selected['ts'] = int(arr['ts'][best])
+        return selected, bool((max_dev <= tolerance).all()) and fresh
+    
+    def compute_indicators(self, close_prices, rsi_period=14, bb_period=20):
+        """
+        一次遍历计算MACD(12,26,9)、RSI和布林带（两倍标准差），返回Indicators数组组
+        """
+        prices = np.ascontiguousarray(close_prices, dtype=np.float64)
+        return indicators_fused(prices, 12, 26, 9, rsi_period, bb_period, 2.0)
+    
+    def safe_macd_calculation(self, close_prices, min_periods=26, indicators=None):
+        """
+        安全的MACD计算，包含数据验证
+        indicators 为 compute_indicators 对同一价格序列的结果，提供时直接取值不再计算
+        （RSI、布林带方法同理，连续计算多个指标时只需遍历一次价格）
+        """
         if len(close_prices) < min_periods:
             return None, None, None
         
@@ -78,17 +186,13 @@ class EnhancedStockAnalyzer:
             return None, None, None
         
         try:
-            macd, macd_signal, macd_hist = talib.MACD(
-                np.array(clean_prices, dtype=np.double),
-                fastperiod=12,
-                slowperiod=26, 
-                signalperiod=9
-            )
+            ind = indicators if indicators is not None else self.compute_indicators(clean_prices)
+            macd, macd_signal, macd_hist = ind.macd[-1], ind.signal[-1], ind.hist[-1]
             
             # 返回最后的有效值
-            final_macd = macd[-1] if len(macd) > 0 and not np.isnan(macd[-1]) else None
-            final_signal = macd_signal[-1] if len(macd_signal) > 0 and not np.isnan(macd_signal[-1]) else None
-            final_hist = macd_hist[-1] if len(macd_hist) > 0 and not np.isnan(macd_hist[-1]) else None
+            final_macd = macd if not np.isnan(macd) else None
+            final_signal = macd_signal if not np.isnan(macd_signal) else None
+            final_hist = macd_hist if not np.isnan(macd_hist) else None
             
             # 验证MACD值的合理性（避免0值异常）
             if final_macd is not None and abs(final_macd) < 1e-10:
@@ -113,32 +217,13 @@ class EnhancedStockAnalyzer:
         if len(returns) == 0:
             return None
         
-        # 使用截断均值减少异常值影响
-        if len(returns) > 10:  # 只有在数据足够多时才使用截断均值
-            sorted_returns = np.sort(returns)
-            trim_start = int(0.05 * len(returns))
-            trim_end = int(0.95 * len(returns))
-            if trim_end > trim_start:
-                trimmed_returns = sorted_returns[trim_start:trim_end]
-                avg_return = np.mean(trimmed_returns)
-            else:
-                avg_return = np.mean(returns)
-        else:
-            avg_return = np.mean(returns)
-        
-        # 年化收益率
-        annual_return = avg_return * 252
-        
-        # 计算波动率
-        volatility = np.std(returns) * np.sqrt(252)
+        # 截断均值（减少异常值影响）、波动率和年化夏普比率由同一个内核计算
+        sharpe = trimmed_sharpe(returns, risk_free_rate, 252.0)
         
-        # 避免除零错误
-        if volatility == 0:
+        # 波动率为0时无法计算
+        if np.isnan(sharpe):
             return None
         
-        # 计算夏普比率
-        sharpe = (annual_return - risk_free_rate) / volatility
-        
         # 检查夏普比率是否在合理范围（-10 到 10）
         if abs(sharpe) > 10:
             print(f"警告: 夏普比率 {sharpe:.2f} 可能异常")
@@ -146,8 +231,8 @@ class EnhancedStockAnalyzer:
         
         return sharpe
     
-    def safe_rsi_calculation(self, close_prices, period=14):
-        """安全的RSI计算"""
+    def safe_rsi_calculation(self, close_prices, period=14, indicators=None):
+        """安全的RSI计算，indicators 须按相同的period计算"""
         if len(close_prices) < period + 1:
             return None
         
@@ -157,7 +242,8 @@ class EnhancedStockAnalyzer:
             if len(clean_prices) < period + 1:
                 return None
             
-            rsi_values = talib.RSI(np.array(clean_prices, dtype=np.double), timeperiod=period)
+            ind = indicators if indicators is not None else self.compute_indicators(clean_prices, rsi_period=period)
+            rsi_values = ind.rsi
             current_rsi = rsi_values[-1] if not np.isnan(rsi_values[-1]) else None
             
             # 验证RSI值的合理性（0-100之间）
@@ -169,8 +255,8 @@ class EnhancedStockAnalyzer:
             print(f'RSI计算错误: {e}')
             return None
     
-    def safe_bollinger_bands(self, close_prices, period=20):
-        """安全的布林带计算"""
+    def safe_bollinger_bands(self, close_prices, period=20, indicators=None):
+        """安全的布林带计算，indicators 须按相同的period计算"""
         if len(close_prices) < period:
             return None, None, None
         
@@ -180,18 +266,14 @@ class EnhancedStockAnalyzer:
             if len(clean_prices) < period:
                 return None, None, None
             
-            upper, middle, lower = talib.BBANDS(
-                np.array(clean_prices, dtype=np.double),
-                timeperiod=period,
-                nbdevup=2,
-                nbdevdn=2,
-                matype=0
-            )
+            # 上下轨取两倍标准差（与talib.BBANDS默认参数一致）
+            ind = indicators if indicators is not None else self.compute_indicators(clean_prices, bb_period=period)
+            upper, middle, lower = ind.upper[-1], ind.middle[-1], ind.lower[-1]
             
             return (
-                upper[-1] if not np.isnan(upper[-1]) else None,
-                middle[-1] if not np.isnan(middle[-1]) else None,
-                lower[-1] if not np.isnan(lower[-1]) else None
+                upper if not np.isnan(upper) else None,
+                middle if not np.isnan(middle) else None,
+                lower if not np.isnan(lower) else None
             )
         except Exception as e:
             print(f'布林带计算错误: {e}')
@@ -217,18 +299,16 @@ class EnhancedStockAnalyzer:
             data = api.real([stock_code])
             if stock_code in data and data[stock_code]:
                 stock_info = data[stock_code]
-                current_price = self.safe_float_conversion(stock_info.get('now'))
-                volume = self.safe_float_conversion(stock_info.get('volume', 0))
-                
-                # 从easyquotation获取的成交额可能是错误的，所以单独处理
+                # 从easyquotation获取的成交额可能是错误的，所以单独处理单位
                 amount_str = stock_info.get('成交额', '0')
-                if isinstance(amount_str, str) and '万' in amount_str:
-                    # 如果是中文格式如"1.23亿"或"4567万"
-                    amount = self.safe_float_conversion(amount_str)
-                    if '亿' in amount_str:
-                        amount *= 10000  # 亿转万
-                else:
-                    amount = self.safe_float_conversion(amount_str)
+                
+                # 价格、成交量、成交额一次批量转换
+                current_price, volume, amount = self.safe_float_conversion_array(
+                    [stock_info.get('now'), stock_info.get('volume', 0), amount_str]
+                ).tolist()
+                if isinstance(amount_str, str) and '万' in amount_str and '亿' in amount_str:
+                    # 如果是中文格式如"1.23亿"
+                    amount *= 10000  # 亿转万
                 
                 print(f'\n【实时数据】')
                 print(f'当前价格: {current_price:.2f}元')
@@ -297,8 +377,11 @@ class EnhancedStockAnalyzer:
                 if len(close_prices) >= 26:  # MACD需要至少26个数据点
                     print(f'\n【技术分析】')
                     
+                    # 三个指标由一次遍历计算得到，各safe_*方法只做校验和取值
+                    indicators = self.compute_indicators(close_prices)
+                    
                     # MACD
-                    macd, macd_signal, macd_hist = self.safe_macd_calculation(close_prices)
+                    macd, macd_signal, macd_hist = self.safe_macd_calculation(close_prices, indicators=indicators)
                     if macd is not None and macd_signal is not None:
                         print(f'MACD: {macd:.2f} (信号线: {macd_signal:.2f})')
                         if macd > macd_signal:
@@ -309,7 +392,7 @@ class EnhancedStockAnalyzer:
                         print('MACD: 计算失败或数据不足')
                     
                     # RSI
-                    rsi = self.safe_rsi_calculation(close_prices)
+                    rsi = self.safe_rsi_calculation(close_prices, indicators=indicators)
                     if rsi is not None:
                         print(f'RSI: {rsi:.2f}')
                         if rsi > 70:
@@ -322,7 +405,7 @@ class EnhancedStockAnalyzer:
                         print('RSI: 计算失败或数据不足')
                     
                     # 布林带
-                    bb_upper, bb_middle, bb_lower = self.safe_bollinger_bands(close_prices)
+                    bb_upper, bb_middle, bb_lower = self.safe_bollinger_bands(close_prices, indicators=indicators)
                     if bb_upper is not None and bb_middle is not None and bb_lower is not None:
                         current_close = close_prices[-1]
                         print(f'布林带位置: 当前价格 {current_close:.2f}')
@@ -352,26 +435,21 @@ class EnhancedStockAnalyzer:
             if not fin_indicator.empty:
                 latest_fin = fin_indicator.iloc[-1]
                 
-                # 解析财务数据
-                def parse_financial_value(value_str):
-                    if pd.isna(value_str):
-                        return 0.0
-                    if isinstance(value_str, str):
-                        value_str = value_str.replace('亿', '').replace('万', '').replace('%', '')
-                        try:
-                            return float(value_str)
-                        except ValueError:
-                            return 0.0
-                    return float(value_str) if value_str is not None else 0.0
-                
-                net_profit = parse_financial_value(latest_fin.get('净利润', 0))  # 亿元
-                eps = parse_financial_value(latest_fin.get('基本每股收益', 0))  # 元/股
-                bps = parse_financial_value(latest_fin.get('每股净资产', 0))  # 元/股
-                roe = parse_financial_value(latest_fin.get('净资产收益率', 0))  # %
-                gross_margin = parse_financial_value(latest_fin.get('销售毛利率', 0))  # %
-                net_margin = parse_financial_value(latest_fin.get('销售净利率', 0))  # %
-                current_ratio = parse_financial_value(latest_fin.get('流动比率', 0))
-                debt_to_asset = parse_financial_value(latest_fin.get('资产负债率', 0))  # %
+                # 解析财务数据：各字段一次批量转换为float64数组，缺失或无法解析的值记为0
+                fin_fields = [
+                    '净利润',        # 亿元
+                    '基本每股收益',  # 元/股
+                    '每股净资产',    # 元/股
+                    '净资产收益率',  # %
+                    '销售毛利率',    # %
+                    '销售净利率',    # %
+                    '流动比率',
+                    '资产负债率',    # %
+                ]
+                fin_values = self.safe_float_conversion_array([latest_fin.get(f, 0) for f in fin_fields])
+                fin_values[np.isnan(fin_values)] = 0.0
+                (net_profit, eps, bps, roe, gross_margin,
+                 net_margin, current_ratio, debt_to_asset) = fin_values.tolist()
                 
                 print(f'净利润: {net_profit:.2f} 亿元')
                 print(f'  → 净利润规模显示公司盈利能力')
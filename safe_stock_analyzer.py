@@ -2,6 +2,10 @@
 """
 安全的股票分析工具
 包含代码验证和交叉验证机制
+
+SafeStockAnalyzer.CAPABILITIES 为类（及子类）公开方法名的frozenset，在类定义时生成；
+调用方判断分析器是否支持某功能时使用 'validate_stock_code' in SafeStockAnalyzer.CAPABILITIES，
+不要用 hasattr 探测
 """
 
 import akshare as ak
@@ -10,10 +14,25 @@ import pandas as pd
 import numpy as np
 import talib
 import warnings
+from validation_framework import is_valid_code_format
 warnings.filterwarnings('ignore')
 
 
+def _public_methods(cls):
+    """收集类及其基类中定义的公开方法名"""
+    return frozenset(
+        name
+        for klass in cls.__mro__ if klass is not object
+        for name, attr in vars(klass).items()
+        if callable(attr) and not name.startswith('_')
+    )
+
+
 class SafeStockAnalyzer:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.CAPABILITIES = _public_methods(cls)
+    
     def __init__(self):
         self.validated_codes = {}  # 缓存验证过的代码
     
@@ -21,6 +40,10 @@ class SafeStockAnalyzer:
         """
         验证股票代码是否对应目标公司
         """
+        # 格式不对的代码直接拒绝，不发起网络请求
+        if not is_valid_code_format(code):
+            return False, f"代码格式无效: {code}"
+        
         try:
             info = ak.stock_individual_info_em(symbol=code)
             if info.empty:
@@ -215,6 +238,10 @@ class SafeStockAnalyzer:
         return "\\n".join(report)
 
 
+# __init_subclass__ 只对子类生效，基类自身的能力集合在类定义后生成
+SafeStockAnalyzer.CAPABILITIES = _public_methods(SafeStockAnalyzer)
+
+
 def main():
     analyzer = SafeStockAnalyzer()
     
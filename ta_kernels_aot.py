@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+技术指标AOT编译脚本
+运行 python ta_kernels_aot.py 在当前目录生成 ta_kernels 扩展模块，
+各测试脚本通过 _indicator_kernels 自动加载，无需在每个进程中重新JIT编译
+"""
+
+import os
+
+from numba.pycc import CC
+
+from _indicator_kernels import rsi, sma, source_digest
+
+cc = CC('ta_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 周期参数与JIT签名一致使用i8
+cc.export('rsi_f64', 'f8[:](f8[:], i8)')(rsi.py_func)
+cc.export('sma_f64', 'f8[:](f8[:], i8)')(sma.py_func)
+
+# 记录编译时的源码摘要，_indicator_kernels 加载时据此识别过期的扩展模块
+_DIGEST = source_digest()
+
+
+@cc.export('source_digest', 'i8()')
+def _source_digest():
+    return _DIGEST
+
+
+if __name__ == '__main__':
+    cc.compile()
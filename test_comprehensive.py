@@ -14,6 +14,8 @@ from datetime import datetime
 # 添加项目路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from _data_cache import cached_sina_real
+
 def test_imports():
     """测试所有模块是否可以正确导入"""
     print("=== 测试模块导入 ===")
@@ -173,8 +175,7 @@ def test_data_access():
     total_tests += 1
     try:
         import easyquotation
-        api = easyquotation.use('sina')
-        data = api.real(['002594'])
+        data = cached_sina_real(('002594',))
         if '002594' in data and data['002594']:
             print("✓ EasyQuotation实时数据获取成功")
             success_count += 1
@@ -199,7 +200,10 @@ def test_technical_indicators():
         prices = 100 + np.cumsum(np.random.randn(100) * 0.5)
         high = prices * (1 + np.abs(np.random.randn(100)) * 0.01)
         low = prices * (1 - np.abs(np.random.randn(100)) * 0.01)
-        close = prices
+        # 统一为C连续的float64，TA-Lib不再内部复制输入
+        close = np.ascontiguousarray(prices, dtype=np.float64)
+        high = np.ascontiguousarray(high, dtype=np.float64)
+        low = np.ascontiguousarray(low, dtype=np.float64)
         
         # 测试TA-Lib功能
         try:
@@ -273,11 +277,13 @@ def test_risk_metrics():
             print("✗ 夏普比率计算失败")
             return False
         
-        # 计算最大回撤
-        cumulative_returns = np.cumprod(1 + returns)
-        running_max = np.maximum.accumulate(cumulative_returns)
-        drawdown = (cumulative_returns - running_max) / running_max
-        max_drawdown = np.min(drawdown)
+        # 计算最大回撤：净值、回撤共用一个缓冲区，峰值另占一个，不产生其他临时数组
+        cumulative_returns = np.add(returns, 1.0, out=np.empty_like(returns))
+        np.multiply.accumulate(cumulative_returns, out=cumulative_returns)
+        running_max = np.maximum.accumulate(cumulative_returns, out=np.empty_like(cumulative_returns))
+        drawdown = np.subtract(cumulative_returns, running_max, out=cumulative_returns)
+        np.divide(drawdown, running_max, out=drawdown)
+        max_drawdown = drawdown.min()
         
         if isinstance(max_drawdown, float):
             print("✓ 最大回撤计算成功")
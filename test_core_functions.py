@@ -8,6 +8,8 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from _test_runner import run_tests_concurrently, summary_lines
+
 def test_module_imports():
     """测试核心模块导入"""
     print("Testing module imports...")
@@ -115,7 +117,11 @@ def test_technical_analysis():
         # 测试talib（如果可用）
         try:
             import talib
-            rsi = talib.RSI(prices, timeperiod=5)
+            from _talib_kernels import compute_indicators
+            
+            rsi = np.empty(len(prices))
+            sma = np.empty(len(prices))
+            compute_indicators(prices, rsi, sma, rsi_period=5, sma_period=5)
             if len(rsi) > 0 and not np.isnan(rsi[-1]):
                 print("✓ TA-Lib technical indicators work")
             else:
@@ -135,16 +141,17 @@ def test_risk_calculations():
     
     try:
         import numpy as np
+        from _risk_kernels import risk_stats, percentile_pair
         
         # 创建模拟收益率数据
         returns = np.array([-0.02, 0.01, -0.01, 0.03, -0.005, 0.02, -0.015, 0.01, 0.005, -0.002])
         
         # 计算VaR
-        var_95 = np.percentile(returns, 5)
+        var_95, _ = percentile_pair(returns, 5.0, 1.0)
         print(f"✓ VaR calculation works: {var_95:.4f}")
         
         # 计算波动率
-        volatility = np.std(returns)
+        _, volatility, _ = risk_stats(returns)
         print(f"✓ Volatility calculation works: {volatility:.4f}")
         
         return True
@@ -155,8 +162,7 @@ def test_risk_calculations():
 
 def main():
     """主测试函数"""
-    print("🚀 Running gupiaoTool Core Functions Test")
-    print("="*50)
+    out = ["🚀 Running gupiaoTool Core Functions Test", "="*50]
     
     tests = [
         ("Module Imports", test_module_imports),
@@ -167,31 +173,22 @@ def main():
         ("Risk Calculations", test_risk_calculations)
     ]
     
-    results = []
-    for test_name, test_func in tests:
-        print(f"\n📋 Running {test_name}...")
-        result = test_func()
-        results.append((test_name, result))
-    
-    print("\n" + "="*50)
-    print("📊 TEST RESULTS SUMMARY")
-    print("="*50)
-    
-    passed = sum(1 for _, result in results if result)
-    total = len(results)
-    
-    for test_name, result in results:
-        status = "✅ PASS" if result else "❌ FAIL"
-        print(f"{status} {test_name}")
-    
-    print(f"\nOverall: {passed}/{total} tests passed")
-    
-    if passed == total:
-        print("\n🎉 All core functions are working properly!")
-        return True
-    else:
-        print(f"\n⚠️  {total - passed} tests failed")
-        return False
+    # 各测试相互独立，并发执行，输出按原顺序统一写出
+    results = {}
+    for test_name, result, output in run_tests_concurrently(tests):
+        out.append(f"\n📋 Running {test_name}...")
+        out.append(output.rstrip("\n"))
+        results[test_name] = result
+    
+    lines, success = summary_lines(
+        results, "📊 TEST RESULTS SUMMARY", 50,
+        "Overall: {passed}/{total} tests passed",
+        on_pass=["\n🎉 All core functions are working properly!"],
+        on_fail=["\n⚠️  {failed} tests failed"],
+    )
+    out.extend(lines)
+    sys.stdout.write("\n".join(out) + "\n")
+    return success
 
 if __name__ == "__main__":
     success = main()
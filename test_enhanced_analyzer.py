@@ -6,8 +6,26 @@
 
 import sys
 import os
+import io
+import functools
+import time
+from contextlib import redirect_stdout
+import numpy as np
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from _test_runner import summary_lines
+
+# 模拟数据在模块加载时由固定种子的生成器一次生成，结果可复现
+_RNG = np.random.default_rng(42)
+_PRICES = _RNG.random(30) * 10.0 + 50.0  # MACD/RSI/布林带共用的价格序列
+_RETURNS = _RNG.normal(0.001, 0.02, 252)  # 模拟日收益率
+
+@functools.lru_cache(maxsize=1)
+def _get_analyzer():
+    """创建并缓存分析器实例，各测试共用一个，导入失败时抛出ImportError"""
+    from enhanced_stock_analyzer import EnhancedStockAnalyzer
+    return EnhancedStockAnalyzer()
+
 def test_enhanced_analyzer():
     """测试增强版分析器的功能"""
     print("🧪 测试增强版股票分析器")
@@ -18,20 +36,26 @@ def test_enhanced_analyzer():
         
         print("✅ 导入EnhancedStockAnalyzer成功")
         
-        # 创建分析器实例
-        analyzer = EnhancedStockAnalyzer()
+        # 创建分析器实例（后续测试复用同一实例）
+        analyzer = _get_analyzer()
         print("✅ 创建分析器实例成功")
         
         # 测试数据验证方法
         print("\n🔍 测试数据验证方法...")
         
         # 测试安全浮点转换
-        test_values = ["52.46", "N/A", None, 52.46, "1.23亿", "4567万"]
+        test_values = ["52.46", "N/A", None, 52.46, "1.23亿", "4567万", "nan"]
         print("  测试安全浮点转换:")
-        for val in test_values:
-            result = analyzer.safe_float_conversion(val)
+        results = analyzer.safe_float_conversion_array(test_values)
+        for val, result in zip(test_values, results.tolist()):
             print(f"    {val} -> {result}")
         
+        # 一次向量化检查代替逐个断言
+        assert results.dtype == np.float64
+        np.testing.assert_array_equal(np.isnan(results) | np.isfinite(results), True)
+        np.testing.assert_array_equal(results, [52.46, 0.0, 0.0, 52.46, 1.23, 4567.0, np.nan])
+        np.testing.assert_array_equal(results, [analyzer.safe_float_conversion(v) for v in test_values])
+        
         print("  ✅ 安全浮点转换功能正常")
         
         # 测试交易数据验证
@@ -41,18 +65,69 @@ def test_enhanced_analyzer():
         is_valid, msg = analyzer.validate_trade_data(100, 1000000, 5.0)  # 不匹配的情况
         print(f"  交易数据验证 (100手, 100万, 5元): {msg}")
         
+        # 批量验证与逐条验证规则一致
+        valids = analyzer.validate_trade_data_array(
+            volume=np.array([100.0, 100.0, 0.0, 100.0]),
+            amount=np.array([50000.0, 1000000.0, 50000.0, -1.0]),
+            price=np.array([5.0, 5.0, 5.0, 5.0]),
+        )
+        np.testing.assert_array_equal(valids, [True, False, False, False])
+        
+        # 成交额为NaN时与原规则一致，不判为无效；只读数组输入同样可用
+        assert analyzer.validate_trade_data(100, float('nan'), 5.0)[0]
+        readonly_volume = np.array([100.0, 100.0])
+        readonly_volume.flags.writeable = False
+        np.testing.assert_array_equal(
+            analyzer.validate_trade_data_array(readonly_volume, [50000.0, 1000000.0], [5.0, 5.0]), [True, False])
+        
         print("  ✅ 交易数据验证功能正常")
         
+        # 测试多数据源一致性检查（第三个数据源成交额单位错误），时间戳为int64纪元纳秒
+        now_ns = time.time_ns()
+        sources_data = {
+            'sina': {'price': 52.46, 'volume': 12000, 'amount': 62952000, 'ts': now_ns},
+            'tencent': {'price': 52.45, 'volume': 12010, 'amount': 62990000, 'ts': now_ns - 2 * 10**9},
+            'eastmoney': {'price': 52.46, 'volume': 12000, 'amount': 6295.2, 'ts': now_ns},
+        }
+        selected, consistent = analyzer.validate_data_consistency(sources_data)
+        print(f"  数据源一致性: {'一致' if consistent else '存在偏差'}, 采用 {selected['source']}")
+        if consistent or selected['source'] == 'eastmoney':
+            raise AssertionError("数据源一致性检查未识别出异常数据源")
+        
+        # 打包后的结构化数组与字典形式结果一致
+        if analyzer.validate_data_consistency(analyzer._pack_sources(sources_data)) != (selected, consistent):
+            raise AssertionError("结构化数组形式的一致性检查结果不一致")
+        
+        # 数值一致但行情时间相差过大的数据源不算一致
+        fresh_sources = {k: v for k, v in sources_data.items() if k != 'eastmoney'}
+        if not analyzer.validate_data_consistency(fresh_sources)[1]:
+            raise AssertionError("时间戳相近的一致数据源被判为不一致")
+        fresh_sources['tencent'] = {**fresh_sources['tencent'], 'ts': now_ns - 120 * 10**9}
+        if analyzer.validate_data_consistency(fresh_sources)[1]:
+            raise AssertionError("时间戳过期的数据源未被识别")
+        
+        print("  ✅ 数据源一致性检查功能正常")
+        
+        # 一次遍历计算全部指标，各safe_*方法取其最后一个值
+        test_prices = _PRICES
+        macd_arr, signal_arr, hist_arr, rsi_arr, upper_arr, middle_arr, lower_arr = analyzer.compute_indicators(test_prices)
+        last = np.array([a[-1] for a in (macd_arr, signal_arr, hist_arr, rsi_arr, upper_arr, middle_arr, lower_arr)])
+        
+        # 只读数组（如pandas写时复制下的Series.values）结果相同
+        readonly_prices = test_prices.copy()
+        readonly_prices.flags.writeable = False
+        np.testing.assert_array_equal(analyzer.compute_indicators(readonly_prices).rsi, rsi_arr)
+        
         # 测试MACD安全计算
-        import numpy as np
-        test_prices = np.random.random(30) * 10 + 50  # 生成模拟价格数据
         macd, signal, hist = analyzer.safe_macd_calculation(test_prices)
+        assert (macd, signal, hist) == analyzer.safe_macd_calculation(test_prices, indicators=analyzer.compute_indicators(test_prices))
+        np.testing.assert_array_equal(np.isnan(last[:3]), [x is None for x in (macd, signal, hist)])
         print(f"  MACD计算结果: {macd:.4f}, {signal:.4f}, {hist:.4f}" if all(x is not None for x in [macd, signal, hist]) else "  MACD计算: 部分结果为None")
         
         print("  ✅ 安全MACD计算功能正常")
         
         # 测试夏普比率计算
-        returns = np.random.normal(0.001, 0.02, 252)  # 模拟日收益率
+        returns = _RETURNS
         sharpe = analyzer.calculate_sharpe_ratio(returns)
         print(f"  夏普比率计算结果: {sharpe:.4f}" if sharpe is not None else "  夏普比率计算: 结果为None")
         
@@ -60,12 +135,14 @@ def test_enhanced_analyzer():
         
         # 测试RSI安全计算
         rsi = analyzer.safe_rsi_calculation(test_prices)
+        np.testing.assert_allclose(rsi, last[3])
         print(f"  RSI计算结果: {rsi:.2f}" if rsi is not None else "  RSI计算: 结果为None")
         
         print("  ✅ 安全RSI计算功能正常")
         
         # 测试布林带安全计算
         upper, middle, lower = analyzer.safe_bollinger_bands(test_prices)
+        np.testing.assert_allclose([upper, middle, lower], last[4:])
         if all(x is not None for x in [upper, middle, lower]):
             print(f"  布林带计算结果: 上轨{upper:.2f}, 中轨{middle:.2f}, 下轨{lower:.2f}")
         else:
@@ -89,10 +166,7 @@ def test_error_handling():
     print("-" * 40)
     
     try:
-        from enhanced_stock_analyzer import EnhancedStockAnalyzer
-        import numpy as np
-        
-        analyzer = EnhancedStockAnalyzer()
+        analyzer = _get_analyzer()
         
         # 测试空数据处理
         macd, signal, hist = analyzer.safe_macd_calculation([])
@@ -106,8 +180,8 @@ def test_error_handling():
         print("  ✅ 短数据处理正常")
         
         # 测试包含NaN的数据处理
-        nan_data = [50.0, np.nan, 52.0, 53.0, 54.0, 55.0] * 5  # 重复以满足最小长度
-        nan_data = [x for x in nan_data if not (isinstance(x, float) and np.isnan(x))]  # 移除NaN
+        nan_data = np.tile(np.array([50.0, np.nan, 52.0, 53.0, 54.0, 55.0]), 5)  # 重复以满足最小长度
+        nan_data = nan_data[np.isfinite(nan_data)]  # 移除NaN，结果为连续float64数组
         macd, signal, hist = analyzer.safe_macd_calculation(nan_data)
         print("  ✅ NaN数据处理正常")
         
@@ -151,36 +225,37 @@ def compare_with_original():
 
 def main():
     """主测试函数"""
-    print("🚀 开始测试增强版股票分析器")
-    print("="*70)
-    
-    results = []
-    
-    # 运行各项测试
-    results.append(("核心功能测试", test_enhanced_analyzer()))
-    results.append(("错误处理测试", test_error_handling()))
+    out = ["🚀 开始测试增强版股票分析器", "="*70]
     
-    # 显示总结果
-    print("\n" + "="*70)
-    print("📊 测试结果汇总")
-    print("="*70)
-    
-    for test_name, result in results:
-        status = "✅ PASS" if result else "❌ FAIL"
-        print(f"{status} {test_name}")
+    results = {}
     
-    passed = sum(1 for _, result in results if result)
-    total = len(results)
+    # 运行各项测试，捕获输出后统一写出
+    for test_name, test_func in [("核心功能测试", test_enhanced_analyzer),
+                                 ("错误处理测试", test_error_handling)]:
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            result = test_func()
+        out.append(buf.getvalue().rstrip("\n"))
+        results[test_name] = result
     
-    print(f"\n总成绩: {passed}/{total} 测试通过")
+    # 全部通过时附上改进说明
+    improvements = []
+    if all(results.values()):
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            compare_with_original()
+        improvements.append(buf.getvalue().rstrip("\n"))
     
-    if passed == total:
-        print("\n🎉 所有测试通过！增强版分析器功能正常。")
-        compare_with_original()
-        return True
-    else:
-        print(f"\n⚠️  {total - passed} 个测试失败，请检查相关功能。")
-        return False
+    # 显示总结果
+    lines, success = summary_lines(
+        results, "📊 测试结果汇总", 70,
+        "总成绩: {passed}/{total} 测试通过",
+        on_pass=["\n🎉 所有测试通过！增强版分析器功能正常。", *improvements],
+        on_fail=["\n⚠️  {failed} 个测试失败，请检查相关功能。"],
+    )
+    out.extend(lines)
+    sys.stdout.write("\n".join(out) + "\n")
+    return success
 
 if __name__ == "__main__":
     success = main()
@@ -6,9 +6,35 @@ gupiaoTool健壮性测试脚本
 
 import sys
 import os
+import functools
+import importlib
 import numpy as np
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from _test_runner import run_tests_concurrently, summary_lines
+from _tests_common import BASE_PRICES, run
+
+# 已导入模块缓存，各测试共享，避免重复走导入流程
+_MODULES = {}
+
+def _get(name):
+    """导入并缓存模块，导入失败时抛出ImportError且不缓存"""
+    if name not in _MODULES:
+        _MODULES[name] = importlib.import_module(name)
+    return _MODULES[name]
+
+def _sma(x, w):
+    """SMA参考实现：前缀和相减，O(N)，只返回完整窗口部分"""
+    c = np.empty(x.size + 1, dtype=np.float64)
+    c[0] = 0.0
+    np.cumsum(x, out=c[1:])
+    return (c[w:] - c[:-w]) / w
+
+@functools.lru_cache(maxsize=1)
+def _get_validator():
+    """首次调用时创建验证器并缓存，供多个测试复用；导入失败时由调用的测试报告"""
+    return _get('validation_framework').StockAnalysisValidator()
+
 def test_module_imports():
     """测试核心模块导入"""
     print("Testing module imports...")
@@ -21,7 +47,7 @@ def test_module_imports():
     
     for module_name in modules:
         try:
-            __import__(module_name)
+            _get(module_name)
             print(f"✓ {module_name} imported successfully")
         except ImportError as e:
             print(f"✗ Failed to import {module_name}: {e}")
@@ -34,9 +60,7 @@ def test_stock_validator():
     print("\nTesting stock validator...")
     
     try:
-        from validation_framework import StockAnalysisValidator
-        
-        validator = StockAnalysisValidator()
+        validator = _get_validator()
         
         # 测试已知股票
         is_valid, code = validator.validate_before_analysis("比亚迪", "002594")
@@ -65,20 +89,19 @@ def test_safe_analyzer_creation():
     print("\nTesting safe analyzer creation...")
     
     try:
-        from safe_stock_analyzer import SafeStockAnalyzer
-        
         # 只测试创建实例，不进行网络验证
+        SafeStockAnalyzer = _get('safe_stock_analyzer').SafeStockAnalyzer
         analyzer = SafeStockAnalyzer()
         print("✓ Safe analyzer instance created successfully")
         
-        # 测试内部方法是否存在
-        if hasattr(analyzer, 'validate_stock_code'):
+        # 测试内部方法是否存在（查类定义时生成的能力集合）
+        if 'validate_stock_code' in SafeStockAnalyzer.CAPABILITIES:
             print("✓ validate_stock_code method exists")
         else:
             print("✗ validate_stock_code method missing")
             return False
             
-        if hasattr(analyzer, 'search_stock_code'):
+        if 'search_stock_code' in SafeStockAnalyzer.CAPABILITIES:
             print("✓ search_stock_code method exists")
         else:
             print("✗ search_stock_code method missing")
@@ -103,7 +126,7 @@ def test_basic_libs():
     
     for lib_name, alias in libs:
         try:
-            lib = __import__(lib_name)
+            lib = _get(lib_name)
             print(f"✓ {lib_name} imported successfully")
         except ImportError:
             print(f"⚠ {lib_name} not available")
@@ -128,17 +151,27 @@ def test_technical_analysis_local():
         
         # 测试TA-Lib（如果可用）- 使用正确的数据类型
         try:
-            import talib
+            talib = _get('talib')
+            sma_f64 = _get('_indicator_kernels').sma_f64
             
-            # 确保数据类型为double
-            prices = np.array([100.0, 102.0, 101.0, 103.0, 105.0, 104.0, 106.0, 108.0, 107.0, 109.0], dtype=np.double)
+            # 模块级float64序列，只读使用无需复制
+            prices = BASE_PRICES
             
-            # 计算简单的移动平均线
-            ma5 = talib.SMA(prices, timeperiod=5)
+            # 计算简单的移动平均线（与talib.SMA结果一致）
+            ma5 = sma_f64(prices, 5)
             if ma5 is not None and len(ma5) > 0:
                 print("✓ TA-Lib SMA calculation works")
             else:
                 print("⚠ TA-Lib SMA returned empty result")
+            
+            # 以前缀和SMA作为参考值核对数值
+            expected = _sma(prices, 5)
+            if (np.allclose(ma5[4:], expected)
+                    and np.allclose(talib.SMA(prices, timeperiod=5)[4:], expected)):
+                print("✓ SMA values match reference")
+            else:
+                print("✗ SMA values do not match reference")
+                return False
                 
         except ImportError:
             print("⚠ TA-Lib not installed, skipping TA-Lib tests")
@@ -157,18 +190,15 @@ def test_risk_calculations():
         # 测试基本风险指标计算
         returns = np.array([-0.02, 0.01, -0.01, 0.03, -0.005, 0.02, -0.015, 0.01, 0.005, -0.002], dtype=np.double)
         
-        # 计算VaR
-        var_95 = np.percentile(returns, 5)
+        # VaR、波动率和夏普比率由同一个内核一次算出（无风险利率0.02按252个交易日折算）
+        returns_stats = _get('_risk_kernels').returns_stats
+        risk_free_rate = 0.02  # 年化无风险利率
+        _, volatility, var_95, _, daily_sharpe, _ = returns_stats(returns, risk_free_rate / 252)
         print(f"✓ VaR calculation works: {var_95:.4f}")
-        
-        # 计算波动率
-        volatility = np.std(returns)
         print(f"✓ Volatility calculation works: {volatility:.4f}")
         
-        # 计算夏普比率（假设无风险利率为0.02/252）
-        expected_return = np.mean(returns) * 252  # 年化
-        risk_free_rate = 0.02  # 年化无风险利率
-        sharpe = (expected_return - risk_free_rate) / (volatility * np.sqrt(252)) if volatility != 0 else 0
+        # 年化夏普比率
+        sharpe = daily_sharpe * np.sqrt(252)
         print(f"✓ Sharpe ratio calculation works: {sharpe:.4f}")
         
         return True
@@ -182,14 +212,15 @@ def test_data_structures():
     print("\nTesting data structures...")
     
     try:
-        import pandas as pd
+        pd = _get('pandas')
+        
+        # 列数据先构造为独立的numpy数组，DataFrame只作为被测的构造函数使用
+        prices = np.array([100.0, 101.0, 102.0])
+        volumes = np.array([1000, 1500, 1200], dtype=np.int64)
+        dates = np.arange('2023-01-01', '2023-01-04', dtype='datetime64[D]')
         
-        # 测试DataFrame创建和操作
-        df = pd.DataFrame({
-            'price': [100.0, 101.0, 102.0],
-            'volume': [1000, 1500, 1200],
-            'date': pd.date_range('2023-01-01', periods=3)
-        })
+        # 测试DataFrame创建和操作（copy=False时直接引用上面的数组）
+        df = pd.DataFrame({'price': prices, 'volume': volumes, 'date': dates}, copy=False)
         
         if len(df) == 3 and 'price' in df.columns:
             print("✓ Pandas DataFrame operations work")
@@ -197,9 +228,9 @@ def test_data_structures():
             print("✗ Pandas DataFrame operations failed")
             return False
         
-        # 测试基本数据分析功能
-        mean_price = df['price'].mean()
-        if isinstance(mean_price, float):
+        # 测试基本数据分析功能（从DataFrame取列，数据已知无NaN，在列的底层数组上归约，跳过Series分派）
+        mean_price = df['price'].to_numpy(copy=False).mean()
+        if isinstance(mean_price, float) and mean_price == 101.0:
             print("✓ DataFrame analysis works")
         else:
             print("✗ DataFrame analysis failed")
@@ -216,9 +247,7 @@ def test_validation_framework():
     print("\nTesting validation framework...")
     
     try:
-        from validation_framework import StockAnalysisValidator
-        
-        validator = StockAnalysisValidator()
+        validator = _get_validator()
         
         # 测试已知代码获取
         code = validator.get_correct_code("比亚迪")
@@ -228,6 +257,34 @@ def test_validation_framework():
             print(f"✗ Known code retrieval failed: {code}")
             return False
         
+        # 测试按代码反查名称
+        if validator.validate_by_code("002594") == (True, "比亚迪") and validator.validate_by_code("000000") == (False, None):
+            print("✓ Reverse code lookup works")
+        else:
+            print(f"✗ Reverse code lookup failed: {validator.validate_by_code('002594')}")
+            return False
+        
+        # 测试验证原因代码及其提示文字
+        vf = _get('validation_framework')
+        Reason = vf.ValidationReason
+        cases = [
+            (("屹唐股份", "300346"), (False, "688729", Reason.KNOWN_WRONG)),
+            (("比亚迪", None), (True, "002594", Reason.FOUND)),
+            (("比亚迪", "002594"), (True, "002594", Reason.MATCHED)),
+            (("贵州茅台", "600000"), (False, "600519", Reason.MISMATCH)),
+            (("未知股票", None), (False, None, Reason.UNKNOWN)),
+            (("未知股票", "600000"), (False, None, Reason.UNVERIFIED)),
+        ]
+        for args, expected in cases:
+            if validator.validate_with_reason(*args) != expected:
+                print(f"✗ Validation reason failed for {args}: {validator.validate_with_reason(*args)}")
+                return False
+        lines = vf.format_validation("屹唐股份", "300346", *cases[0][1])
+        if not (len(lines) == 3 and "300346" in lines[1] and "688729" in lines[2]):
+            print(f"✗ Validation message formatting failed: {lines}")
+            return False
+        print("✓ Validation reasons work")
+        
         # 测试添加新代码对
         validator.add_known_pair("测试股票", "123456")
         new_code = validator.get_correct_code("测试股票")
@@ -239,12 +296,44 @@ def test_validation_framework():
         
         # 测试错误代码添加
         validator.add_wrong_code("测试股票", "999999")
-        if "999999" in validator.known_wrong_codes.get("测试股票", []):
+        if "999999" in validator.known_wrong_codes.get("测试股票", frozenset()):
             print("✓ Adding wrong codes works")
         else:
             print("✗ Adding wrong codes failed")
             return False
         
+        # 测试代码格式检查
+        if not (vf.is_valid_code_format("002594")
+                and vf.validate_codes_array(["600519", "830799", "920002", "900901", "200002", "99999", "700001", None]).tolist()
+                == [True, True, True, True, True, False, False, False]):
+            print("✗ Code format check failed")
+            return False
+        print("✓ Code format check works")
+        
+        # 测试批量验证（包含刚添加的代码对和错误代码），结果应与逐条验证一致
+        pairs = [("测试股票", "123456"), ("比亚迪", "300346"), ("未知股票", None), ("测试股票", "999999")]
+        batch = validator.validate_batch(pairs)
+        if batch['ok'].tolist() == [True, False, False, False] == [validator.validate_before_analysis(*p)[0] for p in pairs]:
+            print("✓ Batch validation works")
+        else:
+            print(f"✗ Batch validation failed: {batch['ok'].tolist()}")
+            return False
+        
+        # 正确代码被标记为错误代码后，批量验证同样不通过
+        validator.add_wrong_code("测试股票", "123456")
+        if validator.validate_batch([("测试股票", "123456")])['ok'].tolist() != [False]:
+            print("✗ Batch validation ignores known wrong codes")
+            return False
+        
+        # 验证结果缓存有上限（使用独立实例，不影响共享的验证器）
+        bounded = vf.StockAnalysisValidator()
+        for i in range(bounded.CACHE_SIZE + 10):
+            bounded.validate_with_reason("未知股票", f"{i:06d}")
+        if len(bounded._cache) != bounded.CACHE_SIZE:
+            print(f"✗ Validation cache is unbounded: {len(bounded._cache)}")
+            return False
+        print("✓ Validation cache is bounded")
+        
         return True
         
     except Exception as e:
@@ -253,8 +342,7 @@ def test_validation_framework():
 
 def main():
     """主测试函数"""
-    print("🚀 Running gupiaoTool Robustness Test")
-    print("="*60)
+    out = ["🚀 Running gupiaoTool Robustness Test", "="*60]
     
     tests = [
         ("Module Imports", test_module_imports),
@@ -267,38 +355,29 @@ def main():
         ("Validation Framework", test_validation_framework)
     ]
     
-    results = []
-    for test_name, test_func in tests:
-        print(f"\n📋 Running {test_name}...")
-        result = test_func()
-        results.append((test_name, result))
-    
-    print("\n" + "="*60)
-    print("📊 FINAL TEST RESULTS")
-    print("="*60)
-    
-    passed = sum(1 for _, result in results if result)
-    total = len(results)
+    # 各测试相互独立，并发执行，输出按原顺序统一写出
+    results = {}
+    for test_name, result, output in run_tests_concurrently(tests):
+        out.append(f"\n📋 Running {test_name}...")
+        out.append(output.rstrip("\n"))
+        results[test_name] = result
     
-    for test_name, result in results:
-        status = "✅ PASS" if result else "❌ FAIL"
-        print(f"{status} {test_name}")
-    
-    print(f"\nOverall Score: {passed}/{total} tests passed")
-    
-    if passed == total:
-        print("\n🎉 All tests passed! gupiaoTool is functioning correctly.")
-        print("✅ Module imports successful")
-        print("✅ Validation framework operational")
-        print("✅ Data processing capabilities confirmed")
-        print("✅ Risk calculation functions verified")
-        print("✅ Technical analysis components ready")
-        return True
-    else:
-        print(f"\n⚠️  {total - passed} tests failed")
-        print("Please check the failed components above.")
-        return False
+    lines, success = summary_lines(
+        results, "📊 FINAL TEST RESULTS", 60,
+        "Overall Score: {passed}/{total} tests passed",
+        on_pass=[
+            "\n🎉 All tests passed! gupiaoTool is functioning correctly.",
+            "✅ Module imports successful",
+            "✅ Validation framework operational",
+            "✅ Data processing capabilities confirmed",
+            "✅ Risk calculation functions verified",
+            "✅ Technical analysis components ready"
+        ],
+        on_fail=["\n⚠️  {failed} tests failed", "Please check the failed components above."],
+    )
+    out.extend(lines)
+    sys.stdout.write("\n".join(out) + "\n")
+    return success
 
 if __name__ == "__main__":
-    success = main()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(0 if run({'robust'}) else 1)
\ No newline at end of file
@@ -4,10 +4,14 @@
 """
 
 import sys
-import traceback
+import importlib
 import pandas as pd
 import numpy as np
 
+from _data_cache import cached_sina_real, cached_spot_em
+from _test_runner import module_available
+from _tests_common import CLOSE_PRICES, NOISE, online, run
+
 def test_basic_imports():
     """测试基本库导入"""
     print("=== 测试基本库导入 ===")
@@ -27,11 +31,16 @@ def test_basic_imports():
     
     results = {}
     for lib, name in libs_to_test:
+        # 先查找模块规格，未安装的库不会进入导入流程，也不会抛出异常
+        if not module_available(lib):
+            print(f"✗ {name} ({lib}) 导入失败")
+            results[lib] = False
+            continue
         try:
-            __import__(lib)
+            importlib.import_module(lib)
             print(f"✓ {name} ({lib}) 导入成功")
             results[lib] = True
-        except ImportError as e:
+        except ImportError:
             print(f"✗ {name} ({lib}) 导入失败")
             results[lib] = False
     
@@ -49,7 +58,7 @@ def test_advanced_features():
         import numpy as np
         
         # 创建测试数据
-        close_prices = np.array([100, 102, 101, 103, 105, 104, 106, 108, 107, 109] * 10, dtype=float)
+        close_prices = CLOSE_PRICES
         
         # 测试MACD
         try:
@@ -82,7 +91,7 @@ def test_advanced_features():
         
         # 创建测试数据
         df = pd.DataFrame({
-            'close': [100, 102, 101, 103, 105, 104, 106, 108, 107, 109] * 10
+            'close': CLOSE_PRICES.copy()
         })
         
         # 测试RSI
@@ -123,46 +132,50 @@ def test_advanced_features():
         print("✗ Plotly 未安装")
         results['plotly'] = False
     
-    # 测试数据获取
-    try:
-        import easyquotation
+    # 测试数据获取（网络不可用时跳过，避免逐个等待连接超时；结果记为None，不计入成功率）
+    if not online():
+        print("- 网络不可用，跳过数据获取测试")
+        results['easyquotation_realtime'] = None
+        results['akshare_realtime'] = None
+    else:
         try:
-            api = easyquotation.use('sina')
-            data = api.real(['002594'])
-            if '002594' in data and data['002594']:
-                print("✓ EasyQuotation 数据获取成功")
-                results['easyquotation'] = True
-            else:
-                print("✗ EasyQuotation 数据获取返回空值")
-                results['easyquotation'] = False
-        except Exception as e:
-            print(f"✗ EasyQuotation 数据获取失败: {e}")
-            results['easyquotation'] = False
-    except ImportError:
-        print("✗ EasyQuotation 未安装")
-        results['easyquotation'] = False
+            import easyquotation
+            try:
+                data = cached_sina_real(('002594',))
+                if '002594' in data and data['002594']:
+                    print("✓ EasyQuotation 数据获取成功")
+                    results['easyquotation_realtime'] = True
+                else:
+                    print("✗ EasyQuotation 数据获取返回空值")
+                    results['easyquotation_realtime'] = False
+            except Exception as e:
+                print(f"✗ EasyQuotation 数据获取失败: {e}")
+                results['easyquotation_realtime'] = False
+        except ImportError:
+            print("✗ EasyQuotation 未安装")
+            results['easyquotation_realtime'] = False
     
-    try:
-        import akshare as ak
         try:
-            stock_data = ak.stock_zh_a_spot_em()
-            if not stock_data.empty and len(stock_data) > 0:
-                print("✓ AkShare 实时数据获取成功")
-                results['akshare_realtime'] = True
-            else:
-                print("✗ AkShare 实时数据获取返回空值")
+            import akshare as ak
+            try:
+                stock_data = cached_spot_em()
+                if not stock_data.empty and len(stock_data) > 0:
+                    print("✓ AkShare 实时数据获取成功")
+                    results['akshare_realtime'] = True
+                else:
+                    print("✗ AkShare 实时数据获取返回空值")
+                    results['akshare_realtime'] = False
+            except Exception as e:
+                print(f"✗ AkShare 实时数据获取失败: {e}")
                 results['akshare_realtime'] = False
-        except Exception as e:
-            print(f"✗ AkShare 实时数据获取失败: {e}")
+        except ImportError:
+            print("✗ AkShare 未安装")
             results['akshare_realtime'] = False
-    except ImportError:
-        print("✗ AkShare 未安装")
-        results['akshare_realtime'] = False
     
     # 测试风险管理计算
     try:
         import numpy as np
-        returns = np.random.normal(0.001, 0.02, 100)
+        returns = 0.001 + 0.02 * NOISE[:100]
         
         # 测试VaR
         try:
@@ -203,14 +216,16 @@ def run_test():
     print("测试结果汇总:")
     print("="*50)
     
-    total = len(all_results)
+    # 结果为None表示测试被跳过，既不计入通过数也不计入总数
+    skipped = sum(1 for v in all_results.values() if v is None)
+    total = len(all_results) - skipped
     passed = sum(1 for v in all_results.values() if v)
     
     for name, result in all_results.items():
-        status = "PASS" if result else "FAIL"
-        print(f"{name:20}: {status}")
+        status = "SKIP" if result is None else "PASS" if result else "FAIL"
+        print(f"{name:24}: {status}")
     
-    print(f"\n总计: {passed}/{total} 通过")
+    print(f"\n总计: {passed}/{total} 通过" + (f"，{skipped} 项跳过" if skipped else ""))
     success_rate = (passed / total * 100) if total > 0 else 0
     print(f"成功率: {success_rate:.1f}%")
     
@@ -222,10 +237,4 @@ def run_test():
         return False
 
 if __name__ == "__main__":
-    try:
-        success = run_test()
-        sys.exit(0 if success else 1)
-    except Exception as e:
-        print(f"测试执行出错: {e}")
-        traceback.print_exc()
-        sys.exit(1)
\ No newline at end of file
+    sys.exit(0 if run({'simple'}) else 1)
\ No newline at end of file
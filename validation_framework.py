@@ -4,76 +4,215 @@
 包含错误预防和数据验证机制
 """
 
+import functools
+import logging
+import re
+import sys
+import types
+from collections import OrderedDict
+from enum import IntEnum
+
+_LOG = logging.getLogger(__name__)
+
+# 沪深京A股/B股代码格式：深市主板000-003、深市B股200/201、创业板300-302、沪市主板600/601/603/605、
+# 科创板688/689、沪市B股900、北交所4xx/8xx/920，后接三位数字
+_CODE_RE = re.compile(r'(?:00[0-3]|20[01]|30[0-2]|60[0135]|68[89]|900|4[0-9]{2}|8[0-9]{2}|920)[0-9]{3}')
+
+
+def is_valid_code_format(code):
+    """
+    检查股票代码格式（不联网），格式不对的代码无需再去数据源核对
+    """
+    return isinstance(code, str) and _CODE_RE.fullmatch(code) is not None
+
+
+def validate_codes_array(codes):
+    """
+    批量检查股票代码格式，返回与输入等长的布尔数组，非字符串视为无效
+    """
+    # 只有批量接口依赖numpy/pandas，验证器其余部分无第三方依赖
+    import numpy as np
+    import pandas as pd
+    
+    s = pd.Series(list(codes), dtype=object)
+    try:
+        matched = s.str.fullmatch(_CODE_RE)
+    except AttributeError:
+        # 输入中没有字符串时无法使用.str访问器
+        return np.zeros(len(s), dtype=bool)
+    return matched.fillna(False).to_numpy(dtype=bool)
+
+
+# 已知的正确股票代码映射，导入时构建一次，各验证器实例共享只读视图
+# （名称和代码均驻留，字典比较键时可直接按身份命中）
+_KNOWN_CODES = types.MappingProxyType({sys.intern(name): sys.intern(code) for name, code in {
+    '比亚迪': '002594',
+    '屹唐股份': '688729',
+    '贵州茅台': '600519',
+    '宁德时代': '300750',
+    '隆基绿能': '601012',
+    '五粮液': '000858',
+    '中国平安': '601318',
+    '招商银行': '600036',
+    '阳光电源': '300274',
+    '汇川技术': '300124'
+}.items()})
+
+# 已知的错误代码映射（用于提醒），值为不可变集合以便O(1)判断是否命中
+_KNOWN_WRONG_CODES = types.MappingProxyType({
+    sys.intern('屹唐股份'): frozenset({'300346', '300442', '600729'})  # 之前错误使用的代码
+})
+
+# 代码 -> 名称 的反向索引（与_KNOWN_CODES构成双向映射，共用同一批驻留字符串）
+_CODE_TO_NAME = types.MappingProxyType({code: name for name, code in _KNOWN_CODES.items()})
+
+
+class ValidationReason(IntEnum):
+    """验证结论的原因代码"""
+    MATCHED = 0       # 提供的代码与已知正确代码一致
+    FOUND = 1         # 未提供代码，找到已知正确代码
+    KNOWN_WRONG = 2   # 命中已知错误代码
+    MISMATCH = 3      # 提供的代码与已知正确代码不一致
+    UNKNOWN = 4       # 未知股票且未提供代码
+    UNVERIFIED = 5    # 未知股票，无法核对提供的代码
+
+
+def format_validation(target_name, provided_code, is_valid, correct_code, reason):
+    """
+    将验证结果转换为面向用户的提示信息（逐行列表）
+    """
+    lines = [f"🔍 验证即将分析的目标: {target_name}"]
+    if reason == ValidationReason.KNOWN_WRONG:
+        lines.append(f"🚨 检测到已知的错误代码 {provided_code} 用于 {target_name}")
+        if correct_code:
+            lines.append(f"💡 建议使用正确代码: {correct_code}")
+        else:
+            lines.append("⚠️  无法确定正确代码，请手动确认")
+    elif reason == ValidationReason.MISMATCH:
+        lines.append(f"⚠️  提供的代码 {provided_code} 可能不正确")
+        lines.append(f"💡 建议使用正确代码: {correct_code}")
+    elif reason == ValidationReason.FOUND:
+        lines.append(f"✅ 找到已知正确代码: {correct_code}")
+    elif reason == ValidationReason.UNKNOWN:
+        lines.append(f"⚠️  未知股票 {target_name}，需要手动确认代码")
+    elif reason == ValidationReason.MATCHED:
+        lines.append(f"✅ 代码验证通过: {target_name}({provided_code})")
+    else:
+        lines.append(f"❌ 代码验证失败: 提供 {provided_code}, 期望 {correct_code}")
+    return lines
+
+
 class StockAnalysisValidator:
     """
     股票分析验证器
     用于防止错误的代码使用和数据验证
     """
     
+    # 固定属性集合，省去实例__dict__，属性访问更快
+    __slots__ = ('known_codes', 'known_wrong_codes', '_code_to_name', '_cache', '_known_series', '_wrong_pairs')
+    
+    # 验证结果缓存的最大条数，超出时淘汰最久未使用的结果
+    CACHE_SIZE = 1024
+    
     def __init__(self):
-        # 维护已知的正确股票代码映射
-        self.known_codes = {
-            '比亚迪': '002594',
-            '屹唐股份': '688729',
-            '贵州茅台': '600519',
-            '宁德时代': '300750',
-            '隆基绿能': '601012',
-            '五粮液': '000858',
-            '中国平安': '601318',
-            '招商银行': '600036',
-            '阳光电源': '300274',
-            '汇川技术': '300124'
-        }
+        # 映射均为只读视图，直接绑定模块级数据；添加配对时替换为本实例的新视图（写时复制）
+        self.known_codes = _KNOWN_CODES
+        self.known_wrong_codes = _KNOWN_WRONG_CODES
+        self._code_to_name = _CODE_TO_NAME
         
-        # 维护已知的错误代码映射（用于提醒）
-        self.known_wrong_codes = {
-            '屹唐股份': ['300346', '300442', '600729']  # 之前错误使用的代码
-        }
+        # 验证结果缓存（LRU），键为 (名称, 代码)，映射变更时清空
+        self._cache = OrderedDict()
+        
+        # 批量验证用的 名称 -> 正确代码 序列和 (名称, 错误代码) 索引，按需构建，映射变更时清空
+        self._known_series = None
+        self._wrong_pairs = None
     
     def validate_before_analysis(self, target_name, provided_code=None):
         """
-        分析前验证
+        分析前验证，返回 (是否通过, 正确代码)
+        """
+        is_valid, correct_code, _ = self.validate_with_reason(target_name, provided_code)
+        return is_valid, correct_code
+    
+    def validate_with_reason(self, target_name, provided_code=None):
+        """
+        分析前验证，返回 (是否通过, 正确代码, ValidationReason)
+        不输出任何信息，提示文字可由 format_validation 生成
+        """
+        key = (target_name, provided_code)
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+            return result
+        
+        result = self._validate(target_name, provided_code)
+        _LOG.debug("验证 %s(%s): %s", target_name, provided_code, result[2].name)
+        self._cache[key] = result
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+    
+    def _validate(self, target_name, provided_code):
+        """
+        执行实际的验证逻辑
         """
-        print(f"🔍 验证即将分析的目标: {target_name}")
+        # 正确代码只查一次，后续各分支复用
+        correct_code = self.known_codes.get(target_name)
         
-        # 检查是否在已知错误代码列表中
-        if target_name in self.known_wrong_codes:
-            if provided_code in self.known_wrong_codes[target_name]:
-                print(f"🚨 检测到已知的错误代码 {provided_code} 用于 {target_name}")
-                correct_code = self.known_codes.get(target_name)
-                if correct_code:
-                    print(f"💡 建议使用正确代码: {correct_code}")
-                    return False, correct_code
-                else:
-                    print("⚠️  无法确定正确代码，请手动确认")
-                    return False, None
+        # 检查是否在已知错误代码集合中
+        if provided_code in self.known_wrong_codes.get(target_name, ()):
+            return False, correct_code or None, ValidationReason.KNOWN_WRONG
         
         # 如果提供了代码，检查是否在已知正确代码中
         if provided_code:
-            correct_code = self.known_codes.get(target_name)
             if correct_code and provided_code != correct_code:
-                print(f"⚠️  提供的代码 {provided_code} 可能不正确")
-                print(f"💡 建议使用正确代码: {correct_code}")
-                return False, correct_code
+                return False, correct_code, ValidationReason.MISMATCH
         
         # 如果没有提供代码，从已知映射中获取
         if not provided_code:
-            correct_code = self.known_codes.get(target_name)
             if correct_code:
-                print(f"✅ 找到已知正确代码: {correct_code}")
-                return True, correct_code
+                return True, correct_code, ValidationReason.FOUND
             else:
-                print(f"⚠️  未知股票 {target_name}，需要手动确认代码")
-                return False, None
+                return False, None, ValidationReason.UNKNOWN
         
         # 代码匹配验证
-        correct_code = self.known_codes.get(target_name)
         if correct_code == provided_code:
-            print(f"✅ 代码验证通过: {target_name}({provided_code})")
-            return True, provided_code
+            return True, provided_code, ValidationReason.MATCHED
         else:
-            print(f"❌ 代码验证失败: 提供 {provided_code}, 期望 {correct_code}")
-            return False, correct_code
+            return False, correct_code, ValidationReason.UNVERIFIED
+    
+    def validate_batch(self, pairs):
+        """
+        批量验证 [(名称, 代码或None), ...]，一次合并完成，不逐条打印
+        返回与输入顺序一致的DataFrame，列为 ok（是否通过）和 correct_code（正确代码）
+        判定规则与 validate_before_analysis 一致
+        """
+        import pandas as pd
+        
+        if self._known_series is None:
+            self._known_series = pd.Series(self.known_codes, name='correct_code', dtype=object)
+        if self._wrong_pairs is None:
+            self._wrong_pairs = pd.MultiIndex.from_tuples(
+                [(name, code) for name, codes in self.known_wrong_codes.items() for code in codes],
+                names=['name', 'provided'])
+        
+        df = pd.DataFrame(list(pairs), columns=['name', 'provided'])
+        df = df.merge(self._known_series, left_on='name', right_index=True,
+                      how='left', validate='m:1')
+        
+        known = df['correct_code'].notna()
+        missing = df['provided'].isna() | (df['provided'] == '')
+        # 命中已知错误代码时即使与正确代码相同也不通过（与validate_before_analysis一致）
+        wrong = pd.MultiIndex.from_frame(df[['name', 'provided']]).isin(self._wrong_pairs)
+        df['ok'] = known & (missing | (df['provided'] == df['correct_code'])) & ~wrong
+        return df[['ok', 'correct_code']]
+    
+    def validate_by_code(self, code):
+        """
+        按代码直接验证，返回 (是否为已知正确代码, 对应的股票名称)
+        """
+        name = self._code_to_name.get(code)
+        return name is not None, name
     
     def get_correct_code(self, target_name):
         """
@@ -85,23 +224,36 @@ class StockAnalysisValidator:
         """
         添加新的已知正确配对
         """
-        self.known_codes[name] = code
+        name, code = sys.intern(name), sys.intern(code)
+        old_code = self.known_codes.get(name)
+        code_to_name = dict(self._code_to_name)
+        if old_code is not None and code_to_name.get(old_code) == name:
+            del code_to_name[old_code]
+        code_to_name[code] = name
+        self.known_codes = types.MappingProxyType({**self.known_codes, name: code})
+        self._code_to_name = types.MappingProxyType(code_to_name)
+        self._cache.clear()
+        self._known_series = None
         print(f"✅ 添加已知配对: {name}({code})")
     
     def add_wrong_code(self, name, wrong_code):
         """
         添加已知错误代码
         """
-        if name not in self.known_wrong_codes:
-            self.known_wrong_codes[name] = []
-        if wrong_code not in self.known_wrong_codes[name]:
-            self.known_wrong_codes[name].append(wrong_code)
+        wrong_codes = self.known_wrong_codes.get(name, frozenset())
+        if wrong_code not in wrong_codes:
+            self.known_wrong_codes = types.MappingProxyType(
+                {**self.known_wrong_codes, sys.intern(name): wrong_codes | {sys.intern(wrong_code)}})
+            self._cache.clear()
+            self._wrong_pairs = None
             print(f"✅ 添加已知错误代码: {name}({wrong_code})")
 
 
+@functools.lru_cache(maxsize=1)
 def create_analysis_workflow():
     """
     创建安全的分析工作流程
+    进程内只在首次调用时创建，之后返回同一个分析函数和验证器（验证器的修改对所有调用方可见）
     """
     validator = StockAnalysisValidator()
     
@@ -112,7 +264,9 @@ def create_analysis_workflow():
         print(f"🚀 开始安全分析: {target_name}")
         
         # 验证阶段
-        is_valid, correct_code = validator.validate_before_analysis(target_name, code)
+        is_valid, correct_code, reason = validator.validate_with_reason(target_name, code)
+        for line in format_validation(target_name, code, is_valid, correct_code, reason):
+            print(line)
         
         if not is_valid:
             if correct_code: